@@ -0,0 +1,274 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import random
+import tempfile
+from collections import Counter
+from datetime import date, timedelta
+
+from hypothesis import given, settings, strategies as st
+
+# Add the 'code' directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'code')))
+
+import helper
+import estimate
+import edit
+import budget_max
+import income
+
+CATEGORIES = ['Food', 'Groceries', 'Utilities', 'Transport', 'Shopping', 'Miscellaneous']
+
+# Raise these (e.g. PROPERTY_MAX_RECORDS=100000) for a run at scale
+MAX_RECORDS = int(os.environ.get('PROPERTY_MAX_RECORDS', 500))
+MAX_USERS = int(os.environ.get('PROPERTY_MAX_USERS', 50))
+
+# Amounts are whole cents so the reference sums are exact
+amounts = st.integers(min_value=1, max_value=10_000_00).map(lambda cents: cents / 100)
+dates = st.dates(min_value=date(2020, 1, 1), max_value=date(2025, 12, 31))
+records = st.tuples(dates, st.sampled_from(CATEGORIES), amounts)
+
+operations = st.lists(
+    st.one_of(
+        st.tuples(st.just('add'), records),
+        st.tuples(st.just('delete'), st.integers(min_value=0)),
+        st.tuples(st.just('overall_budget'), amounts),
+        st.tuples(st.just('category_budget'), st.sampled_from(CATEGORIES), amounts),
+        st.tuples(st.just('edit_cost'), st.integers(min_value=0), amounts),
+        st.tuples(st.just('edit_cat'), st.integers(min_value=0), st.sampled_from(CATEGORIES)),
+        st.tuples(st.just('edit_date'), st.integers(min_value=0), dates),
+        st.tuples(st.just('max_budget'), amounts),
+        st.tuples(st.just('income'), amounts),
+    ),
+    max_size=50,
+)
+
+
+def format_record(record):
+    """Render a (date, category, amount) tuple the way records are stored"""
+    day, category, amount = record
+    return '{},{},{}'.format(day.strftime('%Y-%m-%d'), category, amount)
+
+
+def build_history(seed_and_size):
+    """Generate a stored history from a seed, so large sizes stay cheap for Hypothesis"""
+    seed, size = seed_and_size
+    rnd = random.Random(seed)
+    start = date(2020, 1, 1)
+    return [
+        format_record((start + timedelta(days=rnd.randrange(2190)),
+                       rnd.choice(CATEGORIES),
+                       rnd.randrange(1, 10_000_00) / 100))
+        for _ in range(size)
+    ]
+
+
+def histories(min_size=0):
+    return st.tuples(st.integers(min_value=0, max_value=2**32),
+                     st.integers(min_value=min_size, max_value=MAX_RECORDS)).map(build_history)
+
+
+def reference_total(history, category=None):
+    """Sum a list of stored records without going through helper"""
+    total = 0.0
+    for line in history:
+        _, cat, amount = line.split(',')[:3]
+        if category is None or cat == category:
+            total += float(amount)
+    return total
+
+
+def parse_estimate(text):
+    """Turn 'Food $25.0\\n...' back into {'Food': 25.0, ...}"""
+    result = {}
+    for line in text.splitlines():
+        category, amount = line.rsplit(' $', 1)
+        result[category] = float(amount)
+    return result
+
+
+class TestStorageProperties(unittest.TestCase):
+    """Replays random operation sequences through the JSON store and the bot handlers.
+
+    Adds, deletes and overall/category budgets go through helper.read_json/write_json directly;
+    edits, the per-transaction limit and income go through edit, budget_max and income.
+    """
+
+    def setUp(self):
+        self.chat_id = 12345
+        self.bot = MagicMock()
+
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.store_path = os.path.join(tmpdir.name, 'expense_record.json')
+
+        # Point helper's relative 'expense_record.json' at the temp dir without touching the cwd
+        def redirect(path):
+            return self.store_path if path == 'expense_record.json' else path
+
+        fake_os = MagicMock(wraps=os)
+        fake_os.path.exists.side_effect = lambda path: os.path.exists(redirect(path))
+        fake_os.stat.side_effect = lambda path: os.stat(redirect(path))
+        for patcher in (
+            patch('helper.open', create=True,
+                  side_effect=lambda file, *args, **kwargs: open(redirect(file), *args, **kwargs)),
+            patch('helper.os', fake_os),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def reset_store(self):
+        if os.path.exists(self.store_path):
+            os.remove(self.store_path)
+
+    def make_message(self, text):
+        message = MagicMock()
+        message.chat.id = self.chat_id
+        message.text = text
+        return message
+
+    @settings(max_examples=50, deadline=None)
+    @given(st.dictionaries(st.integers(min_value=1, max_value=10**9).map(str), histories(), max_size=MAX_USERS))
+    def test_write_read_round_trip(self, user_histories):
+        """read_json returns exactly what write_json stored."""
+        self.reset_store()
+        user_list = {}
+        for chat_id, history in user_histories.items():
+            user_list[chat_id] = helper.createNewUserRecord()
+            user_list[chat_id]['data'] = history
+        helper.write_json(user_list)
+        self.assertEqual(helper.read_json(), user_list)
+
+    def write_user(self, update):
+        """Apply update to this user's stored record through the legacy read_json/write_json cycle"""
+        user_list = helper.read_json()
+        update(user_list[str(self.chat_id)])
+        helper.write_json(user_list)
+
+    @settings(max_examples=50, deadline=None)
+    @given(histories(min_size=1), operations)
+    def test_operation_sequence_matches_model(self, history, ops):
+        """The store agrees with an in-memory model after any sequence of adds, deletes, edits and budget changes."""
+        self.reset_store()
+        model = helper.createNewUserRecord()
+        model['data'] = list(history)
+        stored = helper.createNewUserRecord()
+        stored['data'] = list(history)
+        helper.write_json({str(self.chat_id): stored})
+
+        for op in ops:
+            kind = op[0]
+            if kind == 'add':
+                line = format_record(op[1])
+                self.write_user(lambda record: record['data'].append(line))
+                model['data'].append(line)
+            elif kind == 'overall_budget':
+                self.write_user(lambda record: record['budget'].update(overall=str(op[1])))
+                model['budget']['overall'] = str(op[1])
+            elif kind == 'category_budget':
+                def set_category_budget(record):
+                    record['budget']['category'] = dict(record['budget']['category'] or {}, **{op[1]: str(op[2])})
+                self.write_user(set_category_budget)
+                set_category_budget(model)
+            elif kind == 'income':
+                text = str(op[1])
+                income.process_income_input(self.make_message(text), self.bot)
+                model['income'] = float(text)
+            elif kind == 'max_budget':
+                text = str(op[1])
+                budget_max.post_max_budget(self.make_message(text), self.bot)
+                value = helper.validate_entered_amount(text)
+                if value != 0:
+                    model['budget']['max_per_txn_spend'] = value
+            elif not model['data']:
+                continue
+            else:
+                index = op[1] % len(model['data'])
+                target = model['data'][index]
+                day, category, amount = target.split(',')
+                selected_data = ['Date=' + day, 'Category=' + category, 'Amount=$' + amount]
+                if kind == 'delete':
+                    # Remove by value so duplicate records cannot make the model and store diverge
+                    self.write_user(lambda record: record['data'].remove(target))
+                    model['data'].remove(target)
+                elif kind == 'edit_cost':
+                    text = str(op[2])
+                    edit.edit_cost(self.make_message(text), self.bot, selected_data)
+                    value = helper.validate_entered_amount(text)
+                    if value != 0:
+                        model['data'][index] = '{},{},{}'.format(day, category, value)
+                elif kind == 'edit_cat':
+                    edit.edit_cat(self.make_message(op[2]), self.bot, selected_data)
+                    model['data'][index] = '{},{},{}'.format(day, op[2], amount)
+                elif kind == 'edit_date':
+                    text = op[2].strftime('%d-%b-%Y')
+                    edit.edit_date(self.make_message(text), self.bot, selected_data)
+                    # edit may store the entered or the ISO form; only the edited record may differ
+                    untouched = Counter(model['data'][:index] + model['data'][index + 1:])
+                    changed = Counter(helper.getUserData(self.chat_id)['data']) - untouched
+                    candidates = ['{},{},{}'.format(new_day, category, amount)
+                                  for new_day in (text, op[2].strftime('%Y-%m-%d'))]
+                    self.assertEqual(len(list(changed.elements())), 1)
+                    self.assertIn(next(changed.elements()), candidates)
+                    model['data'][index] = next(changed.elements())
+
+        stored = helper.getUserData(self.chat_id)
+        self.assertEqual(Counter(stored['data']), Counter(model['data']))
+        self.assertEqual(stored['budget'], model['budget'])
+        self.assertEqual(stored.get('income'), model.get('income'))
+        self.assertAlmostEqual(helper.calculate_total_expenditure(self.chat_id),
+                               reference_total(model['data']), places=6)
+        for category in CATEGORIES:
+            self.assertAlmostEqual(helper.calculate_total_expenditure(self.chat_id, category=category),
+                                   reference_total(model['data'], category), places=6)
+        if 'income' in model:
+            self.assertAlmostEqual(helper.get_remaining_budget(self.chat_id, None),
+                                   model['income'] - reference_total(model['data']), places=6)
+
+
+class TestAggregationProperties(unittest.TestCase):
+    """Compares aggregates against straightforward reference computations."""
+
+    def setUp(self):
+        self.chat_id = 12345
+
+    @settings(max_examples=200, deadline=None)
+    @given(histories(), st.sampled_from([None] + CATEGORIES))
+    def test_total_expenditure_matches_reference(self, history, category):
+        """calculate_total_expenditure equals a plain sum over the records."""
+        with patch('helper.getUserData', return_value={'data': history}):
+            total = helper.calculate_total_expenditure(self.chat_id, category=category)
+        self.assertAlmostEqual(total, reference_total(history, category), places=6)
+
+    @settings(max_examples=100, deadline=None)
+    @given(histories(min_size=1), st.randoms())
+    def test_estimate_independent_of_record_order(self, history, rnd):
+        """Shuffling the history does not change the estimate."""
+        shuffled = list(history)
+        rnd.shuffle(shuffled)
+        expected = parse_estimate(estimate.calculate_estimate(history, 1))
+        actual = parse_estimate(estimate.calculate_estimate(shuffled, 1))
+        self.assertEqual(expected.keys(), actual.keys())
+        for category in expected:
+            # Float sums in a different order can round to a neighbouring cent
+            self.assertAlmostEqual(expected[category], actual[category], delta=0.011)
+
+    @settings(max_examples=100, deadline=None)
+    @given(dates, st.lists(st.tuples(st.sampled_from(CATEGORIES), st.integers(min_value=1, max_value=1000)),
+                           min_size=1, max_size=50),
+           st.sampled_from([1, 30]))
+    def test_single_day_estimate_scales_category_totals(self, day, entries, days_to_estimate):
+        """With one day of history the estimate is each category's total times the period."""
+        history = [format_record((day, category, amount)) for category, amount in entries]
+        expected = {}
+        for category, amount in entries:
+            expected[category] = expected.get(category, 0) + amount * days_to_estimate
+        actual = parse_estimate(estimate.calculate_estimate(history, days_to_estimate))
+        self.assertEqual(actual.keys(), expected.keys())
+        for category in expected:
+            self.assertAlmostEqual(actual[category], expected[category], places=2)
+
+
+if __name__ == '__main__':
+    unittest.main()